@@ -11,15 +11,17 @@ from flask import (
     session,
     flash,
     abort,
+    send_file,
 )
 import pandas as pd
+import numpy as np
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
 import json
 import io
-import base64
 import math
 import os
 from datetime import datetime
@@ -35,14 +37,29 @@ from functools import wraps
 # Paths & in-memory cache
 # ------------------------------
 DATA_PATH = "All_Diets.csv"
-CLEAN_PATH = "Cleaned_All_Diets.csv"
+CLEAN_PATH = "Cleaned_All_Diets.parquet"
+
+MACRO_COLS = ["Protein(g)", "Carbs(g)", "Fat(g)"]
+
+# Label column types, applied while the CSV is parsed. Macros are coerced
+# afterwards so a bad cell becomes 0 instead of failing the whole parse.
+LABEL_DTYPES = {
+    "Diet_type": "category",
+    "Cuisine_type": "category",
+    "Recipe_name": "string",
+}
+
+# Columns kept in the cache (and read back from the Parquet copy)
+DATASET_COLS = [*LABEL_DTYPES, *MACRO_COLS]
 
 # In-memory cache so we don’t keep re-reading & re-cleaning
 CACHE = {
-    "source_mtime": None,           # last modified time of All_Diets.csv
+    "source_mtime": None,           # last modified time of All_Diets.csv (ns)
     "df": None,                     # cleaned dataframe
+    "diet_index": {},               # lowercase diet -> row positions in df
     "avg_macros_by_diet": None,     # precomputed averages for charts
     "recipe_counts_by_diet": None,  # precomputed counts for pie chart
+    "charts": {},                   # diet -> {kind: PNG bytes}
 }
 
 
@@ -116,39 +133,85 @@ with app.app_context():
 # ------------------------------
 # Cache / summary helpers
 # ------------------------------
-def build_cache() -> None:
+def load_clean_dataset() -> pd.DataFrame:
     """
-    Read All_Diets.csv, clean it once, compute summary results and
-    store everything in the global CACHE dict. Also writes a cleaned
-    copy to Cleaned_All_Diets.csv for inspection / Azure upload.
+    Return the cleaned dataset. Reuses Cleaned_All_Diets.parquet when it is
+    newer than All_Diets.csv, otherwise parses + cleans the CSV and writes
+    a fresh Parquet copy.
     """
-    df = pd.read_csv(DATA_PATH)
+    if (
+        os.path.exists(CLEAN_PATH)
+        and os.path.getmtime(CLEAN_PATH) > os.path.getmtime(DATA_PATH)
+    ):
+        try:
+            return pd.read_parquet(CLEAN_PATH, columns=DATASET_COLS)
+        except Exception:
+            # unreadable / stale layout -> rebuild from the CSV below
+            pass
+
+    # typed parse: repeated labels come back as categoricals
+    # (so groupby / value_counts work on int codes)
+    # same columns as the Parquet path, so CACHE["df"] has one schema either way
+    df = pd.read_csv(
+        DATA_PATH, engine="pyarrow", usecols=DATASET_COLS, dtype=LABEL_DTYPES
+    )
 
-    # clean numeric macro columns
-    for col in ["Protein(g)", "Carbs(g)", "Fat(g)"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    df[["Protein(g)", "Carbs(g)", "Fat(g)"]] = df[
-        ["Protein(g)", "Carbs(g)", "Fat(g)"]
-    ].fillna(0)
+    # clean numeric macro columns: bad / missing values -> 0, stored as float32
+    df[MACRO_COLS] = (
+        df[MACRO_COLS]
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0)
+        .astype("float32")
+    )
 
-    # save cleaned copy (this simulates what your blob-trigger function would write)
+    # save cleaned copy (typed + compressed, so the next start skips CSV parsing)
     try:
-        df.to_csv(CLEAN_PATH, index=False)
+        df.to_parquet(CLEAN_PATH, index=False, compression="zstd")
     except Exception:
         # not fatal if write fails locally
         pass
 
+    return df
+
+
+def build_cache() -> None:
+    """
+    Load the cleaned dataset, compute summary results and store
+    everything in the global CACHE dict.
+    """
+    df = load_clean_dataset()
+
+    # sort once by name; diet filters and keyword masks keep this order,
+    # so the recipes view can page without re-sorting
+    df = df.sort_values("Recipe_name", kind="stable", ignore_index=True)
+
+    # lookup-only helper columns (added here, after load_clean_dataset() has
+    # written the Parquet copy, so they never end up in that file)
+    df["_diet_lc"] = df["Diet_type"].str.lower().astype("category")
+    df["_recipe_lc"] = df["Recipe_name"].str.lower()
+    df["_cuisine_lc"] = df["Cuisine_type"].str.lower().astype("category")
+
     # ----- precomputed results (used for charts) -----
-    avg_macros = df.groupby("Diet_type")[["Protein(g)", "Carbs(g)", "Fat(g)"]].mean()
+    avg_macros = df.groupby("Diet_type", observed=True)[
+        ["Protein(g)", "Carbs(g)", "Fat(g)"]
+    ].mean()
     recipe_counts = df["Diet_type"].value_counts()
 
     CACHE["df"] = df
+    # lowercase diet -> row positions, so filter_by_diet is a direct gather
+    CACHE["diet_index"] = df.groupby("_diet_lc", observed=True).indices
     CACHE["avg_macros_by_diet"] = avg_macros
     CACHE["recipe_counts_by_diet"] = recipe_counts
 
+    # ----- pre-rendered charts, one set per diet ("" = all diets) -----
+    CACHE["charts"] = {
+        diet: render_charts(avg_macros, recipe_counts, diet)
+        for diet in ["", *df["Diet_type"].cat.categories]
+    }
+
     # ---- persist summary data into DB ----
-    avg_dict = avg_macros.round(2).to_dict(orient="index")
+    # float64 before rounding, so the JSON holds 69.28 rather than float32 noise
+    avg_dict = avg_macros.astype("float64").round(2).to_dict(orient="index")
     counts_dict = recipe_counts.to_dict()
 
     def upsert_chart(key, data):
@@ -159,10 +222,11 @@ def build_cache() -> None:
             db.session.add(entry)
         else:
             entry.data_json = data_json
-        db.session.commit()
 
+    # both rows go out in a single transaction
     upsert_chart("avg_macros_by_diet", avg_dict)
     upsert_chart("recipe_counts_by_diet", counts_dict)
+    db.session.commit()
 
 
 def ensure_cache() -> None:
@@ -174,19 +238,13 @@ def ensure_cache() -> None:
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError("All_Diets.csv not found in project root")
 
-    src_mtime = os.path.getmtime(DATA_PATH)
+    # integer nanoseconds: exact, and also used as the chart URL / ETag version
+    src_mtime = os.stat(DATA_PATH).st_mtime_ns
     if CACHE["df"] is None or CACHE["source_mtime"] != src_mtime:
         build_cache()
         CACHE["source_mtime"] = src_mtime
 
 
-def get_chart_cache(key):
-    entry = ChartCache.query.filter_by(key=key).first()
-    if not entry:
-        return None
-    return json.loads(entry.data_json)
-
-
 # ------------------------------
 # Helper: login_required decorator
 # ------------------------------
@@ -199,22 +257,106 @@ def login_required(view_func):
     return wrapped_view
 
 
-def fig_to_base64():
-    """Return current Matplotlib figure as base64 string."""
+# One figure reused for every chart (cleared between plots) instead of
+# creating a new one each time; built without pyplot, on an Agg canvas
+_FIG = Figure()
+FigureCanvasAgg(_FIG)
+
+
+def new_chart(figsize):
+    """Clear the shared figure, resize it and return a fresh Axes."""
+    _FIG.clf()
+    _FIG.set_size_inches(*figsize)
+    return _FIG.add_subplot(111)
+
+
+def fig_to_png():
+    """Return the shared Matplotlib figure as PNG bytes."""
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    data = base64.b64encode(buf.read()).decode("utf-8")
+    _FIG.savefig(buf, format="png", bbox_inches="tight")
+    data = buf.getvalue()
     buf.close()
-    plt.close()
     return data
 
 
-def filter_by_diet(df, diet_name: str):
-    """Filter dataframe by diet type (case-insensitive). Empty diet_name returns original df."""
+def filter_by_diet(diet_name: str):
+    """Filter the cached dataframe by diet type (case-insensitive). Empty diet_name returns the whole cached df."""
+    df = CACHE["df"]
     if not diet_name:
         return df
-    return df[df["Diet_type"].str.lower() == diet_name.lower()]
+    # positions in CACHE["diet_index"] are only valid for CACHE["df"]
+    rows = CACHE["diet_index"].get(diet_name.lower(), [])
+    return df.iloc[rows]
+
+
+def render_bar(grp) -> bytes:
+    ax = new_chart((6, 4))
+    # plain str labels: a CategoricalIndex would make seaborn lay out bars in
+    # category order (ignoring the protein sort) and keep empty diet slots
+    sns.barplot(x=grp.index.astype(str), y=grp["Protein(g)"], ax=ax)
+    for label in ax.get_xticklabels():
+        label.set(rotation=25, ha="right")
+    ax.set_title("Average Protein by Diet Type")
+    ax.set_ylabel("Protein (g)")
+    return fig_to_png()
+
+
+def render_scatter(df_filtered) -> bytes:
+    ax = new_chart((5, 4))
+    sns.scatterplot(
+        x=df_filtered["Carbs(g)"],
+        y=df_filtered["Fat(g)"],
+        hue=df_filtered["Diet_type"],
+        legend=False,
+        ax=ax,
+    )
+    ax.set_title("Carbs vs Fat")
+    ax.set_xlabel("Carbs (g)")
+    ax.set_ylabel("Fat (g)")
+    return fig_to_png()
+
+
+def render_heatmap(df_filtered) -> bytes:
+    ax = new_chart((4, 3))
+    corr = df_filtered[["Protein(g)", "Carbs(g)", "Fat(g)"]].corr()
+    sns.heatmap(corr, annot=True, cmap="coolwarm", vmin=-1, vmax=1, ax=ax)
+    ax.set_title("Macro Correlations")
+    return fig_to_png()
+
+
+def render_pie(cnt) -> bytes:
+    ax = new_chart((4, 4))
+    ax.pie(cnt.values, labels=cnt.index, autopct="%1.1f%%", startangle=140)
+    ax.set_title("Recipe Distribution by Diet")
+    return fig_to_png()
+
+
+def render_charts(avg_macros, recipe_counts, diet_name: str) -> dict:
+    """
+    Render the four dashboard charts for one diet ("" = all diets)
+    and return them as {kind: PNG bytes}.
+    """
+    df_filtered = filter_by_diet(diet_name)
+
+    # bar + pie use the precomputed tables; just the selected diet’s row when filtered
+    if diet_name:
+        grp = avg_macros.loc[[diet_name]]
+        cnt = recipe_counts.loc[[diet_name]]
+    else:
+        grp = avg_macros
+        cnt = recipe_counts
+    grp = grp.sort_values("Protein(g)", ascending=False)
+
+    charts = {
+        "bar": render_bar(grp),
+        "scatter": render_scatter(df_filtered),
+    }
+    # correlations need at least two records
+    if df_filtered.shape[0] > 1:
+        charts["heatmap"] = render_heatmap(df_filtered)
+    charts["pie"] = render_pie(cnt)
+
+    return charts
 
 
 def is_safe_url(target):
@@ -248,8 +390,9 @@ def register():
             flash("Passwords do not match.", "error")
             return redirect(url_for("register"))
 
-        existing = User.query.filter_by(email=email).first()
-        if existing:
+        # id-only lookup: no need to load the full user row just to check
+        exists = db.session.query(User.id).filter_by(email=email).first() is not None
+        if exists:
             flash("An account with this email already exists.", "error")
             return redirect(url_for("register"))
 
@@ -311,78 +454,32 @@ def index():
     total_pages = 1
 
     # base filtered dataframe (used by several actions)
-    df_filtered = filter_by_diet(df_all, selected_diet)
+    df_filtered = filter_by_diet(selected_diet)
 
     if action == "insights":
-        df_filtered = filter_by_diet(df_all, selected_diet)
-
-        # ----- 1) Bar chart: use precomputed averages -----
-        avg_data = get_chart_cache("avg_macros_by_diet")
-        if avg_data:
-            avg_macros = pd.DataFrame.from_dict(avg_data, orient="index")
-        else:
-            avg_macros = CACHE["avg_macros_by_diet"]  # fallback
-
-        if selected_diet:
-            # just the selected diet’s row (still from precomputed table)
-            grp = avg_macros.loc[[selected_diet]]
-        else:
-            grp = avg_macros
-
-        grp = grp.sort_values("Protein(g)", ascending=False)
-
-        plt.figure(figsize=(6, 4))
-        sns.barplot(x=grp.index, y=grp["Protein(g)"])
-        plt.xticks(rotation=25, ha="right")
-        plt.title("Average Protein by Diet Type")
-        plt.ylabel("Protein (g)")
-        charts["bar"] = fig_to_base64()
-
-        # ----- 2) Scatter: filtered records (lightweight, not a heavy groupby) -----
-        plt.figure(figsize=(5, 4))
-        sns.scatterplot(
-            x=df_filtered["Carbs(g)"],
-            y=df_filtered["Fat(g)"],
-            hue=df_filtered["Diet_type"],
-            legend=False,
-        )
-        plt.title("Carbs vs Fat")
-        plt.xlabel("Carbs (g)")
-        plt.ylabel("Fat (g)")
-        charts["scatter"] = fig_to_base64()
-
-        # ----- 3) Heatmap: correlations on filtered data -----
-        if df_filtered.shape[0] > 1:
-            plt.figure(figsize=(4, 3))
-            corr = df_filtered[["Protein(g)", "Carbs(g)", "Fat(g)"]].corr()
-            sns.heatmap(corr, annot=True, cmap="coolwarm", vmin=-1, vmax=1)
-            plt.title("Macro Correlations")
-            charts["heatmap"] = fig_to_base64()
-
-        # ----- 4) Pie chart: use precomputed counts when no filter -----
-        if selected_diet:
-            cnt = df_filtered["Diet_type"].value_counts()
-        else:
-            counts_data = get_chart_cache("recipe_counts_by_diet")
-            if counts_data:
-                cnt = pd.Series(counts_data)
-            else:
-                cnt = CACHE["recipe_counts_by_diet"]
-
-        plt.figure(figsize=(4, 4))
-        plt.pie(cnt.values, labels=cnt.index, autopct="%1.1f%%", startangle=140)
-        plt.title("Recipe Distribution by Diet")
-        charts["pie"] = fig_to_base64()
+        # charts are pre-rendered per diet in build_cache() and served by
+        # chart_png(); the mtime query param busts browser caches on rebuild
+        version = CACHE["source_mtime"]
+        charts = {
+            kind: url_for("chart_png", diet=selected_diet, kind=kind, v=version)
+            for kind in CACHE["charts"].get(selected_diet, {})
+        }
 
     elif action == "recipes":
         # ----- show recipes with filter + keyword + pagination -----
-        rec_df = df_filtered[["Recipe_name", "Cuisine_type", "Diet_type"]].copy()
+        # read-only view: nothing is assigned into rec_df, the mask below
+        # already returns a new frame
+        rec_df = df_filtered[
+            ["Recipe_name", "Cuisine_type", "Diet_type", "_recipe_lc", "_cuisine_lc"]
+        ]
 
         # keyword search in recipe_name OR cuisine_type
+        # (plain substring match against the pre-lowercased columns)
         if keyword:
+            kw = keyword.lower()
             mask = (
-                rec_df["Recipe_name"].str.contains(keyword, case=False, na=False) |
-                rec_df["Cuisine_type"].str.contains(keyword, case=False, na=False)
+                rec_df["_recipe_lc"].str.contains(kw, regex=False, na=False) |
+                rec_df["_cuisine_lc"].str.contains(kw, regex=False, na=False)
             )
             rec_df = rec_df[mask]
 
@@ -394,7 +491,6 @@ def index():
             page = 1
             message = ["No recipes found for your search."]
         else:
-            rec_df = rec_df.sort_values("Recipe_name")
             total_pages = max(1, math.ceil(total / per_page))
 
             if page < 1:
@@ -406,31 +502,29 @@ def index():
             end = start + per_page
             sliced = rec_df.iloc[start:end]
 
-            message = []
-            for _, row in sliced.iterrows():
-                recipe_name = row["Recipe_name"]
-                cuisine = row["Cuisine_type"]
-                diet = row["Diet_type"]
-                message.append(f"{recipe_name} ({diet}, {cuisine})")
+            # "name (diet, cuisine)" built column-wise instead of per row
+            message = (
+                sliced["Recipe_name"].astype(str)
+                + " ("
+                + sliced["Diet_type"].astype(str)
+                + ", "
+                + sliced["Cuisine_type"].astype(str)
+                + ")"
+            ).tolist()
 
     elif action == "clusters":
         df = df_filtered.copy()
         if df.empty:
             message = ["No data for selected diet."]
         else:
-            def label_row(r):
-                macros = {
-                    "protein": r["Protein(g)"],
-                    "carbs": r["Carbs(g)"],
-                    "fat": r["Fat(g)"],
-                }
-                return max(macros, key=macros.get)
-
-            df["Cluster"] = df.apply(label_row, axis=1)
+            # dominant macro per recipe (ties go to the first column, like max())
+            macros = df[["Protein(g)", "Carbs(g)", "Fat(g)"]].to_numpy()
+            labels = np.array(["protein", "carbs", "fat"])
+            df["Cluster"] = labels[macros.argmax(axis=1)]
             counts = df["Cluster"].value_counts()
             message = [f"{k.title()} dominant: {v} recipes" for k, v in counts.items()]
 
-    diet_options = sorted(df_all["Diet_type"].dropna().unique().tolist())
+    diet_options = sorted(df_all["Diet_type"].cat.categories.tolist())
     user_name = session.get("user_name")
 
     return render_template(
@@ -446,6 +540,30 @@ def index():
     )
 
 
+@app.route("/chart/<kind>.png", defaults={"diet": ""})
+@app.route("/chart/<diet>/<kind>.png")
+@login_required
+def chart_png(diet, kind):
+    ensure_cache()
+    png = CACHE["charts"].get(diet, {}).get(kind)
+    if png is None:
+        return abort(404)
+
+    # URLs carry ?v=<source mtime>, so a given URL never changes content
+    resp = send_file(
+        io.BytesIO(png),
+        mimetype="image/png",
+        etag=f"{CACHE['source_mtime']}-{diet}-{kind}",
+        max_age=31536000,
+    )
+    # send_file(max_age=...) marks the response public; this route is behind
+    # login, so swap that for private rather than sending both
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    resp.cache_control.immutable = True
+    return resp
+
+
 # ------------------------------
 # GitHub OAuth routes
 # ------------------------------
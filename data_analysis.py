@@ -13,33 +13,44 @@ REQUIRED_COLS = [
     "Fat(g)",
 ]
 
+# macros are left to coerce_and_fill so bad values still become the column mean
+LABEL_DTYPES = {
+    "Diet_type": "category",
+    "Cuisine_type": "category",
+    "Recipe_name": "string",
+}
+
 def load_dataset(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    df = pd.read_csv(path, engine="pyarrow")
     for col in REQUIRED_COLS:
         if col not in df.columns:
             raise ValueError(f"missing column: {col}")
-    return df
+    return df.astype(LABEL_DTYPES)
 
 def coerce_and_fill(df: pd.DataFrame) -> pd.DataFrame:
-    for col in ["Protein(g)", "Carbs(g)", "Fat(g)"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-    df["Protein(g)"] = df["Protein(g)"].fillna(df["Protein(g)"].mean(skipna=True))
-    df["Carbs(g)"] = df["Carbs(g)"].fillna(df["Carbs(g)"].mean(skipna=True))
-    df["Fat(g)"] = df["Fat(g)"].fillna(df["Fat(g)"].mean(skipna=True))
+    cols = ["Protein(g)", "Carbs(g)", "Fat(g)"]
+    df[cols] = df[cols].apply(pd.to_numeric, errors="coerce")
+    df[cols] = df[cols].fillna(df[cols].mean(skipna=True))
     return df
 
+def _safe_ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    # divide only where den != 0; the rest stays NaN
+    # (float buffer even when the macro columns are whole-number int64)
+    out = np.full(num.shape, np.nan, dtype=np.float64)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
 def add_ratios(df: pd.DataFrame) -> pd.DataFrame:
-    df["Protein_to_Carbs_ratio"] = np.where(
-        df["Carbs(g)"] != 0, df["Protein(g)"] / df["Carbs(g)"], np.nan
-    )
-    df["Carbs_to_Fat_ratio"] = np.where(
-        df["Fat(g)"] != 0, df["Carbs(g)"] / df["Fat(g)"], np.nan
-    )
+    p = df["Protein(g)"].to_numpy()
+    c = df["Carbs(g)"].to_numpy()
+    f = df["Fat(g)"].to_numpy()
+    df["Protein_to_Carbs_ratio"] = _safe_ratio(p, c)
+    df["Carbs_to_Fat_ratio"] = _safe_ratio(c, f)
     return df
 
 def calc_avg_macros(df: pd.DataFrame) -> pd.DataFrame:
     avg = (
-        df.groupby("Diet_type")[["Protein(g)", "Carbs(g)", "Fat(g)"]]
+        df.groupby("Diet_type", observed=True)[["Protein(g)", "Carbs(g)", "Fat(g)"]]
         .mean()
         .sort_values("Protein(g)", ascending=False)
     )
@@ -48,13 +59,17 @@ def calc_avg_macros(df: pd.DataFrame) -> pd.DataFrame:
 def top_n_by_protein(df: pd.DataFrame, n: int) -> pd.DataFrame:
     return (
         df.sort_values("Protein(g)", ascending=False)
-        .groupby("Diet_type", group_keys=False)
+        .groupby("Diet_type", observed=True, group_keys=False)
         .head(n)
     )
 
 def most_common_cuisine(df: pd.DataFrame) -> pd.DataFrame:
-    s = df.groupby("Diet_type")["Cuisine_type"].agg(lambda x: x.value_counts().idxmax())
-    return s.to_frame(name="Most_common_cuisine")
+    counts = df.groupby(["Diet_type", "Cuisine_type"], observed=True).size()
+    idx = counts.groupby(level=0, observed=True).idxmax()
+    return pd.DataFrame(
+        {"Most_common_cuisine": [cuisine for _, cuisine in idx]},
+        index=idx.index,
+    )
 
 def highest_protein_summary(df: pd.DataFrame, avg_df: pd.DataFrame) -> pd.DataFrame:
     max_row = df.loc[df["Protein(g)"].idxmax()]
@@ -108,7 +123,7 @@ def plot_scatter_top(top_df: pd.DataFrame, outdir: str) -> str | None:
     if top_df.empty:
         return None
     plt.figure(figsize=(10, 6))
-    for d, g in top_df.groupby("Diet_type"):
+    for d, g in top_df.groupby("Diet_type", observed=True):
         plt.scatter(g["Carbs(g)"], g["Protein(g)"], label=d, alpha=0.7)
     plt.xlabel("Carbs (g)")
     plt.ylabel("Protein (g)")
@@ -23,7 +23,7 @@ def _parse_float(s: str) -> float:
 
 def _clean_and_summarize(rows):
     """
-    rows: list of dicts (from csv.DictReader)
+    rows: iterable of dicts (e.g. a csv.DictReader, consumed once)
 
     - Normalizes macro column names
     - Converts macros to float
@@ -108,14 +108,14 @@ def main(
     - Also writes summaries to a local JSON file (for demo)
     """
     # 1) Read CSV from blob trigger stream
-    raw_bytes = inputBlob.read()
-    text = raw_bytes.decode("utf-8")
-
+    # (decode straight from read() so the raw bytes are freed right away)
+    text = inputBlob.read().decode("utf-8")
     reader = csv.DictReader(io.StringIO(text))
-    rows = list(reader)
+    del text
 
     # 2) Clean and summarize
-    cleaned_rows, summaries = _clean_and_summarize(rows)
+    # rows are streamed from the reader, not materialized as a second list
+    cleaned_rows, summaries = _clean_and_summarize(reader)
 
     # 3) Optional: local simulated NoSQL file
     try: